@@ -1,16 +1,31 @@
 # Mushroom CRM - Flask Backend
 # Production-ready API with database integration
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, make_response
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from flask_compress import Compress
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from flask_bcrypt import Bcrypt
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from werkzeug.middleware.proxy_fix import ProxyFix
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError, InvalidHashError
 from datetime import datetime, timedelta
+from functools import lru_cache, wraps
 import os
+import orjson
+import redis
+import time
 from urllib.parse import quote_plus
+import gc
+import hashlib
+import hmac
 
-from dotenv import load_dotenv
 # --- ENVIRONMENT SETUP ---
 try:
     from dotenv import load_dotenv
@@ -39,7 +54,21 @@ except ImportError:
 load_dotenv()
 
 # Initialize Flask app
+class ORJSONProvider(JSONProvider):
+    """Serialize responses with orjson, including raw datetime values"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NAIVE_UTC).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+# Opt-in: trust X-Forwarded-For from this many reverse proxies so remote_addr is
+# the client. Leave at 0 unless the app is only reachable through those proxies.
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.getenv('PROXY_FIX_X_FOR', 0)))
 
 # --- DATABASE CONFIGURATION ---
 db_user = os.getenv('DB_USER', 'postgres')
@@ -48,47 +77,107 @@ db_host = os.getenv('DB_HOST', 'localhost')
 db_port = os.getenv('DB_PORT', '5432')
 db_name = os.getenv('DB_NAME', 'postgres')
 
-database_url = f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
+database_url = f'postgresql+psycopg://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
 
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_pre_ping': True,
-    'pool_recycle': 300,
+    'pool_pre_ping': False,
+    'pool_recycle': 1800,
     'pool_timeout': 30,
-    'pool_size': 10,
-    'max_overflow': 20
+    'pool_size': int(os.getenv('DB_POOL_SIZE', 50)),
+    'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 50)),
+    'pool_use_lifo': True,
+    'connect_args': {'options': '-c statement_timeout=5000'}
 }
 
+# --- AUTH CONFIGURATION ---
+# If Redis is unavailable, fall back to per-process limits instead of failing auth
+app.config['RATELIMIT_SWALLOW_ERRORS'] = True
+app.config['RATELIMIT_IN_MEMORY_FALLBACK_ENABLED'] = True
+app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
+app.config['JWT_ALGORITHM'] = 'HS256'
+JWT_DECODE_CACHE_SIZE = 10000
+
+
+
+# --- RESPONSE COMPRESSION ---
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_MIN_SIZE'] = 500
+app.config['COMPRESS_LEVEL'] = 5
+
+# --- REDIS CONFIGURATION ---
+redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+r = redis.Redis(connection_pool=redis.ConnectionPool.from_url(redis_url, max_connections=50))
+PRODUCT_CACHE_TTL = 300
+DASHBOARD_CACHE_TTL = 60
+AUTH_CACHE_TTL = 60
+
+class CachedJWTManager(JWTManager):
+    """JWTManager that reuses decoded claims for tokens presented repeatedly"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._decode_cached = lru_cache(maxsize=JWT_DECODE_CACHE_SIZE)(super()._decode_jwt_from_config)
+    
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        decoded = self._decode_cached(encoded_token, csrf_value, allow_expired)
+        # Cached claims outlive the token; let a full decode raise the expiry error
+        if not allow_expired and decoded.get('exp', float('inf')) <= time.time():
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        return dict(decoded)
 
 
 # Initialize extensions
-db = SQLAlchemy(app)
+# Keep attributes loaded after commit so responses don't re-SELECT the new row
+db = SQLAlchemy(app, session_options={'expire_on_commit': False})
 bcrypt = Bcrypt(app)
-jwt = JWTManager(app)
+jwt = CachedJWTManager(app)
 CORS(app)
+Compress(app)
+limiter = Limiter(get_remote_address, app=app, storage_uri=redis_url)
+
+# Argon2id password hasher (bcrypt is kept only to verify legacy hashes)
+ph = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1, hash_len=32)
+LEGACY_BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
 
 # ==================== MODELS ====================
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_email_lower', db.text('lower(email)'), unique=True),
+    )
+    # Fetch server-generated timestamps in the INSERT/UPDATE itself via RETURNING
+    __mapper_args__ = {'eager_defaults': True}
     
     id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), unique=True, nullable=False, index=True)
+    email = db.Column(db.String(120), nullable=False)
     password = db.Column(db.String(255), nullable=False)
     name = db.Column(db.String(120), nullable=False)
     role = db.Column(db.String(50), default='Owner')
     phone = db.Column(db.String(20))
     farm_name = db.Column(db.String(120))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     
     def set_password(self, password):
-        self.password = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password = ph.hash(password)
+    
+    def has_legacy_hash(self):
+        return self.password.startswith(LEGACY_BCRYPT_PREFIXES)
     
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password, password)
+        if self.has_legacy_hash():
+            return bcrypt.check_password_hash(self.password, password)
+        try:
+            return ph.verify(self.password, password)
+        except (VerifyMismatchError, InvalidHashError):
+            return False
+    
+    def needs_rehash(self):
+        return self.has_legacy_hash() or ph.check_needs_rehash(self.password)
     
     def to_dict(self):
         return {
@@ -98,12 +187,16 @@ class User(db.Model):
             'role': self.role,
             'phone': self.phone,
             'farm_name': self.farm_name,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
         }
 
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        db.Index('ix_products_user', 'user_id'),
+    )
+    __mapper_args__ = {'eager_defaults': True}
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -111,8 +204,8 @@ class Product(db.Model):
     unit = db.Column(db.String(20), default='box')
     retail_price = db.Column(db.Float, nullable=False)
     wholesale_price = db.Column(db.Float, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
     def to_dict(self):
         return {
@@ -121,37 +214,45 @@ class Product(db.Model):
             'unit': self.unit,
             'retail_price': self.retail_price,
             'wholesale_price': self.wholesale_price,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
         }
 
 
 class Warehouse(db.Model):
     __tablename__ = 'warehouses'
+    __table_args__ = (
+        db.Index('ix_warehouses_user', 'user_id'),
+    )
+    __mapper_args__ = {'eager_defaults': True}
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     name = db.Column(db.String(120), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
     def to_dict(self):
         return {
             'id': self.id,
             'name': self.name,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
         }
 
 
 class Inventory(db.Model):
     __tablename__ = 'inventory'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'warehouse_id', 'product_id', name='uq_inv_uwp'),
+    )
+    __mapper_args__ = {'eager_defaults': True}
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id'), nullable=False)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id', ondelete='CASCADE'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     quantity = db.Column(db.Float, default=0)
     date = db.Column(db.DateTime, default=datetime.utcnow)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     warehouse = db.relationship('Warehouse')
     product = db.relationship('Product')
@@ -161,15 +262,19 @@ class Inventory(db.Model):
             'id': self.id,
             'warehouse_id': self.warehouse_id,
             'product_id': self.product_id,
-            'product_name': self.product.name if self.product else '',
+            'product_name': (get_product_cached(self.product_id) or {}).get('name', ''),
             'quantity': self.quantity,
-            'date': self.date.isoformat(),
-            'created_at': self.created_at.isoformat()
+            'date': self.date,
+            'created_at': self.created_at
         }
 
 
 class Sale(db.Model):
     __tablename__ = 'sales'
+    __table_args__ = (
+        db.Index('ix_sales_user_date', 'user_id', db.text('date DESC')),
+    )
+    __mapper_args__ = {'eager_defaults': True}
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -185,29 +290,33 @@ class Sale(db.Model):
     total = db.Column(db.Float, nullable=False)
     payment_method = db.Column(db.String(50))
     notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     product = db.relationship('Product')
     
     def to_dict(self):
         return {
             'id': self.id,
-            'date': self.date.isoformat(),
+            'date': self.date,
             'type': self.type,
             'customer_name': self.customer_name,
             'shop_name': self.shop_name,
             'product_id': self.product_id,
-            'product': self.product.to_dict() if self.product else None,
+            'product': get_product_cached(self.product_id),
             'quantity': self.quantity,
             'unit_price': self.unit_price,
             'total': self.total,
             'payment_method': self.payment_method,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
         }
 
 
 class Expense(db.Model):
     __tablename__ = 'expenses'
+    __table_args__ = (
+        db.Index('ix_expenses_user_date', 'user_id', db.text('date DESC')),
+    )
+    __mapper_args__ = {'eager_defaults': True}
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -217,23 +326,28 @@ class Expense(db.Model):
     amount = db.Column(db.Float, nullable=False)
     vendor = db.Column(db.String(120))
     payment_method = db.Column(db.String(50))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     def to_dict(self):
         return {
             'id': self.id,
-            'date': self.date.isoformat(),
+            'date': self.date,
             'category': self.category,
             'description': self.description,
             'amount': self.amount,
             'vendor': self.vendor,
             'payment_method': self.payment_method,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
         }
 
 
 class Subscription(db.Model):
     __tablename__ = 'subscriptions'
+    __table_args__ = (
+        db.Index('ix_subscriptions_user_status', 'user_id', 'status'),
+        db.Index('ix_subscriptions_supply_days', 'supply_days', postgresql_using='gin'),
+    )
+    __mapper_args__ = {'eager_defaults': True}
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -244,11 +358,11 @@ class Subscription(db.Model):
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     quantity = db.Column(db.Float)
     frequency = db.Column(db.String(50))  # Weekly, Bi-weekly, Monthly
-    supply_days = db.Column(db.String(255))  # Stored as comma-separated
+    supply_days = db.Column(ARRAY(db.Text), server_default='{}')  # e.g. ['Monday', 'Thursday']
     start_date = db.Column(db.DateTime)
     end_date = db.Column(db.DateTime)
     status = db.Column(db.String(20), default='Active')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     product = db.relationship('Product')
     
@@ -260,17 +374,18 @@ class Subscription(db.Model):
             'email': self.email,
             'address': self.address,
             'product_id': self.product_id,
-            'product_name': self.product.name if self.product else '',
+            'product_name': (get_product_cached(self.product_id) or {}).get('name', ''),
             'quantity': self.quantity,
             'frequency': self.frequency,
-            'supply_days': self.supply_days.split(',') if self.supply_days else [],
+            'supply_days': self.supply_days or [],
             'status': self.status,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
         }
 
 
 class WholesaleCustomer(db.Model):
     __tablename__ = 'wholesale_customers'
+    __mapper_args__ = {'eager_defaults': True}
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -282,7 +397,7 @@ class WholesaleCustomer(db.Model):
     credit_limit = db.Column(db.Float, default=0)
     outstanding_balance = db.Column(db.Float, default=0)
     status = db.Column(db.String(20), default='Active')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     def to_dict(self):
         return {
@@ -295,14 +410,120 @@ class WholesaleCustomer(db.Model):
             'credit_limit': self.credit_limit,
             'outstanding_balance': self.outstanding_balance,
             'status': self.status,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
         }
 
 
+# ==================== CACHE HELPERS ====================
+
+def get_product_cached(product_id):
+    """Read-through Redis cache for product dicts, keyed by id"""
+    if product_id is None:
+        return None
+    
+    key = f'p:{product_id}'
+    try:
+        cached = r.get(key)
+        if cached:
+            return orjson.loads(cached)
+    except redis.RedisError:
+        pass
+    
+    product = db.session.get(Product, product_id)
+    if not product:
+        return None
+    
+    data = product.to_dict()
+    try:
+        r.setex(key, PRODUCT_CACHE_TTL, orjson.dumps(data, option=orjson.OPT_NAIVE_UTC))
+    except redis.RedisError:
+        pass
+    return data
+
+
+def invalidate_product_cache(product_id):
+    """Drop a cached product after it changes"""
+    try:
+        r.delete(f'p:{product_id}')
+    except redis.RedisError:
+        pass
+
+
+def dashboard_cache_key(user_id):
+    """Redis key for a user's dashboard metrics for the current month"""
+    return f'dash:{user_id}:{datetime.utcnow():%Y%m}'
+
+
+def invalidate_dashboard_cache(user_id):
+    """Drop the cached dashboard after sales, expenses or subscriptions change"""
+    try:
+        r.delete(dashboard_cache_key(user_id))
+    except redis.RedisError:
+        pass
+
+
+def check_password_cached(user, password):
+    """Skip the password hash for a login repeated within AUTH_CACHE_TTL"""
+    # Keyed on the stored (salted) hash so a password change invalidates entries
+    digest = hmac.new(user.password.encode('utf-8'), password.encode('utf-8'), hashlib.sha256).hexdigest()
+    key = f'authok:{user.id}:{digest}'
+    try:
+        if r.get(key):
+            return True
+    except redis.RedisError:
+        pass
+    
+    if not user.check_password(password):
+        return False
+    
+    try:
+        r.setex(key, AUTH_CACHE_TTL, '1')
+    except redis.RedisError:
+        pass
+    return True
+
+
+# ==================== LIST PROJECTIONS ====================
+
+SALE_LIST_FIELDS = (
+    'id', 'date', 'type', 'customer_name', 'shop_name', 'product_id',
+    'quantity', 'unit_price', 'total', 'payment_method', 'created_at'
+)
+
+
+def select_inventory_rows():
+    """Column-only inventory select matching Inventory.to_dict()"""
+    return select(
+        Inventory.id, Inventory.warehouse_id, Inventory.product_id,
+        func.coalesce(Product.name, '').label('product_name'),
+        Inventory.quantity, Inventory.date, Inventory.created_at
+    ).join(Product, Inventory.product_id == Product.id, isouter=True)
+
+
+def private_cache(max_age=30):
+    """Let the client reuse a GET response briefly without revalidating"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            response.headers['Cache-Control'] = f'private, max-age={max_age}'
+            # Responses depend on the bearer token; keep other Vary values (e.g. Origin)
+            response.vary.add('Authorization')
+            return response
+        return wrapper
+    return decorator
+
+
+def current_user_id():
+    """User id from the JWT subject, which is encoded as a string"""
+    return int(get_jwt_identity())
+
+
 # ==================== ROUTES ====================
 
 # Authentication Routes
 @app.route('/api/auth/register', methods=['POST'])
+@limiter.limit('10/minute')
 def register():
     """Register a new user"""
     data = request.get_json()
@@ -310,11 +531,12 @@ def register():
     if not data or not data.get('email') or not data.get('password') or not data.get('name'):
         return jsonify({'error': 'Missing required fields'}), 400
     
-    if User.query.filter_by(email=data['email']).first():
+    email = data['email'].strip().lower()
+    if User.query.filter(func.lower(User.email) == email).first():
         return jsonify({'error': 'Email already registered'}), 409
     
     user = User(
-        email=data['email'],
+        email=email,
         name=data['name'],
         role=data.get('role', 'Owner'),
         phone=data.get('phone'),
@@ -332,6 +554,7 @@ def register():
 
 
 @app.route('/api/auth/login', methods=['POST'])
+@limiter.limit('10/minute')
 def login():
     """Login user and return JWT token"""
     data = request.get_json()
@@ -339,15 +562,21 @@ def login():
     if not data or not data.get('email') or not data.get('password'):
         return jsonify({'error': 'Missing email or password'}), 400
     
-    user = User.query.filter_by(email=data['email']).first()
+    email = data['email'].strip().lower()
+    user = User.query.filter(func.lower(User.email) == email).first()
     
-    if not user or not user.check_password(data['password']):
+    if not user or not check_password_cached(user, data['password']):
         return jsonify({'error': 'Invalid email or password'}), 401
     
     if not user.is_active:
         return jsonify({'error': 'User account is inactive'}), 403
     
-    access_token = create_access_token(identity=user.id)
+    # Lazily migrate legacy bcrypt (or outdated Argon2) hashes
+    if user.needs_rehash():
+        user.set_password(data['password'])
+        db.session.commit()
+    
+    access_token = create_access_token(identity=str(user.id))
     
     return jsonify({
         'message': 'Login successful',
@@ -359,18 +588,24 @@ def login():
 # Products Routes
 @app.route('/api/products', methods=['GET'])
 @jwt_required()
+@private_cache()
 def get_products():
     """Get all products for user"""
-    user_id = get_jwt_identity()
-    products = Product.query.filter_by(user_id=user_id).all()
-    return jsonify([p.to_dict() for p in products]), 200
+    user_id = current_user_id()
+    rows = db.session.execute(
+        select(
+            Product.id, Product.name, Product.unit, Product.retail_price,
+            Product.wholesale_price, Product.created_at
+        ).where(Product.user_id == user_id)
+    ).mappings().all()
+    return jsonify([dict(row) for row in rows]), 200
 
 
 @app.route('/api/products', methods=['POST'])
 @jwt_required()
 def create_product():
     """Create a new product"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     data = request.get_json()
     
     if not data or not data.get('name') or not data.get('retail_price') or not data.get('wholesale_price'):
@@ -397,7 +632,7 @@ def create_product():
 @jwt_required()
 def update_product(product_id):
     """Update a product"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     product = Product.query.filter_by(id=product_id, user_id=user_id).first()
     
     if not product:
@@ -408,9 +643,9 @@ def update_product(product_id):
     product.unit = data.get('unit', product.unit)
     product.retail_price = data.get('retail_price', product.retail_price)
     product.wholesale_price = data.get('wholesale_price', product.wholesale_price)
-    product.updated_at = datetime.utcnow()
     
     db.session.commit()
+    invalidate_product_cache(product_id)
     
     return jsonify({
         'message': 'Product updated successfully',
@@ -422,7 +657,7 @@ def update_product(product_id):
 @jwt_required()
 def delete_product(product_id):
     """Delete a product"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     product = Product.query.filter_by(id=product_id, user_id=user_id).first()
     
     if not product:
@@ -430,6 +665,7 @@ def delete_product(product_id):
     
     db.session.delete(product)
     db.session.commit()
+    invalidate_product_cache(product_id)
     
     return jsonify({'message': 'Product deleted successfully'}), 200
 
@@ -437,9 +673,10 @@ def delete_product(product_id):
 # Warehouse Routes
 @app.route('/api/warehouses', methods=['GET'])
 @jwt_required()
+@private_cache()
 def get_warehouses():
     """Get all warehouses for user"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     warehouses = Warehouse.query.filter_by(user_id=user_id).all()
     return jsonify([w.to_dict() for w in warehouses]), 200
 
@@ -448,7 +685,7 @@ def get_warehouses():
 @jwt_required()
 def create_warehouse():
     """Create a new warehouse"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     data = request.get_json()
     
     if not data or not data.get('name'):
@@ -472,7 +709,7 @@ def create_warehouse():
 @jwt_required()
 def update_warehouse(warehouse_id):
     """Update a warehouse"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     warehouse = Warehouse.query.filter_by(id=warehouse_id, user_id=user_id).first()
     
     if not warehouse:
@@ -480,7 +717,6 @@ def update_warehouse(warehouse_id):
     
     data = request.get_json()
     warehouse.name = data.get('name', warehouse.name)
-    warehouse.updated_at = datetime.utcnow()
     
     db.session.commit()
     
@@ -494,15 +730,21 @@ def update_warehouse(warehouse_id):
 @jwt_required()
 def delete_warehouse(warehouse_id):
     """Delete a warehouse"""
-    user_id = get_jwt_identity()
-    warehouse = Warehouse.query.filter_by(id=warehouse_id, user_id=user_id).first()
+    user_id = current_user_id()
+    
+    # Associated inventory is removed by the FK's ON DELETE CASCADE (migration 005)
+    result = db.session.execute(
+        db.delete(Warehouse).where(
+            Warehouse.id == warehouse_id,
+            Warehouse.user_id == user_id
+        ),
+        execution_options={'synchronize_session': False}
+    )
     
-    if not warehouse:
+    if result.rowcount == 0:
+        db.session.rollback()
         return jsonify({'error': 'Warehouse not found'}), 404
     
-    # Delete associated inventory
-    Inventory.query.filter_by(warehouse_id=warehouse_id).delete()
-    db.session.delete(warehouse)
     db.session.commit()
     
     return jsonify({'message': 'Warehouse deleted successfully'}), 200
@@ -511,59 +753,69 @@ def delete_warehouse(warehouse_id):
 # Inventory Routes
 @app.route('/api/inventory', methods=['GET'])
 @jwt_required()
+@private_cache()
 def get_inventory():
     """Get all inventory items for user"""
-    user_id = get_jwt_identity()
-    inventory = Inventory.query.filter_by(user_id=user_id).all()
-    return jsonify([i.to_dict() for i in inventory]), 200
+    user_id = current_user_id()
+    rows = db.session.execute(
+        select_inventory_rows().where(Inventory.user_id == user_id)
+    ).mappings().all()
+    return jsonify([dict(row) for row in rows]), 200
 
 
 @app.route('/api/inventory/warehouse/<int:warehouse_id>', methods=['GET'])
 @jwt_required()
+@private_cache()
 def get_warehouse_inventory(warehouse_id):
     """Get inventory for specific warehouse"""
-    user_id = get_jwt_identity()
-    inventory = Inventory.query.filter_by(user_id=user_id, warehouse_id=warehouse_id).all()
-    return jsonify([i.to_dict() for i in inventory]), 200
+    user_id = current_user_id()
+    rows = db.session.execute(
+        select_inventory_rows().where(
+            Inventory.user_id == user_id,
+            Inventory.warehouse_id == warehouse_id
+        )
+    ).mappings().all()
+    return jsonify([dict(row) for row in rows]), 200
 
 
 @app.route('/api/inventory', methods=['POST'])
 @jwt_required()
 def create_inventory():
     """Add inventory item"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     data = request.get_json()
     
     if not data or not data.get('warehouse_id') or not data.get('product_id') or not data.get('quantity'):
         return jsonify({'error': 'Missing required fields'}), 400
     
-    # Check if already exists
-    existing = Inventory.query.filter_by(
-        user_id=user_id,
-        warehouse_id=data['warehouse_id'],
-        product_id=data['product_id']
-    ).first()
-    
-    if existing:
-        existing.quantity += data['quantity']
-        existing.date = datetime.utcnow()
-        db.session.commit()
-        return jsonify({
-            'message': 'Inventory updated successfully',
-            'inventory': existing.to_dict()
-        }), 200
-    
-    inventory = Inventory(
+    # Insert or add to the existing quantity in one atomic statement
+    stmt = insert(Inventory).values(
         user_id=user_id,
         warehouse_id=data['warehouse_id'],
         product_id=data['product_id'],
         quantity=data['quantity'],
         date=datetime.utcnow()
     )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'warehouse_id', 'product_id'],
+        set_={
+            'quantity': Inventory.__table__.c.quantity + stmt.excluded.quantity,
+            'date': stmt.excluded.date
+        }
+    ).returning(Inventory, literal_column('xmax = 0').label('inserted'))
     
-    db.session.add(inventory)
+    # populate_existing so an instance already in the session reflects the written row
+    inventory, inserted = db.session.execute(
+        stmt, execution_options={'populate_existing': True}
+    ).one()
     db.session.commit()
     
+    if not inserted:
+        return jsonify({
+            'message': 'Inventory updated successfully',
+            'inventory': inventory.to_dict()
+        }), 200
+    
     return jsonify({
         'message': 'Inventory created successfully',
         'inventory': inventory.to_dict()
@@ -574,7 +826,7 @@ def create_inventory():
 @jwt_required()
 def update_inventory(inventory_id):
     """Update inventory quantity"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     inventory = Inventory.query.filter_by(id=inventory_id, user_id=user_id).first()
     
     if not inventory:
@@ -595,7 +847,7 @@ def update_inventory(inventory_id):
 @jwt_required()
 def delete_inventory(inventory_id):
     """Delete inventory item"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     inventory = Inventory.query.filter_by(id=inventory_id, user_id=user_id).first()
     
     if not inventory:
@@ -610,18 +862,46 @@ def delete_inventory(inventory_id):
 # Sales Routes
 @app.route('/api/sales', methods=['GET'])
 @jwt_required()
+@private_cache()
 def get_sales():
     """Get all sales for user"""
-    user_id = get_jwt_identity()
-    sales = Sale.query.filter_by(user_id=user_id).order_by(Sale.date.desc()).all()
-    return jsonify([s.to_dict() for s in sales]), 200
+    user_id = current_user_id()
+    rows = db.session.execute(
+        select(
+            Sale.id, Sale.date, Sale.type, Sale.customer_name, Sale.shop_name,
+            Sale.product_id, Sale.quantity, Sale.unit_price, Sale.total,
+            Sale.payment_method, Sale.created_at,
+            Product.name.label('product_name'),
+            Product.unit.label('product_unit'),
+            Product.retail_price.label('product_retail_price'),
+            Product.wholesale_price.label('product_wholesale_price'),
+            Product.created_at.label('product_created_at')
+        )
+        .join(Product, Sale.product_id == Product.id, isouter=True)
+        .where(Sale.user_id == user_id)
+        .order_by(Sale.date.desc())
+    ).mappings().all()
+    
+    sales = []
+    for row in rows:
+        sale = {k: row[k] for k in SALE_LIST_FIELDS}
+        sale['product'] = {
+            'id': row['product_id'],
+            'name': row['product_name'],
+            'unit': row['product_unit'],
+            'retail_price': row['product_retail_price'],
+            'wholesale_price': row['product_wholesale_price'],
+            'created_at': row['product_created_at']
+        } if row['product_name'] is not None else None
+        sales.append(sale)
+    return jsonify(sales), 200
 
 
 @app.route('/api/sales', methods=['POST'])
 @jwt_required()
 def create_sale():
     """Create a new sale"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     data = request.get_json()
     
     if not data or not data.get('type') or not data.get('total'):
@@ -645,6 +925,7 @@ def create_sale():
     
     db.session.add(sale)
     db.session.commit()
+    invalidate_dashboard_cache(user_id)
     
     return jsonify({
         'message': 'Sale created successfully',
@@ -656,7 +937,7 @@ def create_sale():
 @jwt_required()
 def update_sale(sale_id):
     """Update a sale"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     sale = Sale.query.filter_by(id=sale_id, user_id=user_id).first()
     
     if not sale:
@@ -669,6 +950,7 @@ def update_sale(sale_id):
     sale.total = data.get('total', sale.total)
     
     db.session.commit()
+    invalidate_dashboard_cache(user_id)
     
     return jsonify({
         'message': 'Sale updated successfully',
@@ -680,7 +962,7 @@ def update_sale(sale_id):
 @jwt_required()
 def delete_sale(sale_id):
     """Delete a sale"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     sale = Sale.query.filter_by(id=sale_id, user_id=user_id).first()
     
     if not sale:
@@ -688,6 +970,7 @@ def delete_sale(sale_id):
     
     db.session.delete(sale)
     db.session.commit()
+    invalidate_dashboard_cache(user_id)
     
     return jsonify({'message': 'Sale deleted successfully'}), 200
 
@@ -695,9 +978,10 @@ def delete_sale(sale_id):
 # Expenses Routes
 @app.route('/api/expenses', methods=['GET'])
 @jwt_required()
+@private_cache()
 def get_expenses():
     """Get all expenses for user"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     expenses = Expense.query.filter_by(user_id=user_id).order_by(Expense.date.desc()).all()
     return jsonify([e.to_dict() for e in expenses]), 200
 
@@ -706,7 +990,7 @@ def get_expenses():
 @jwt_required()
 def create_expense():
     """Create a new expense"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     data = request.get_json()
     
     if not data or not data.get('category') or not data.get('amount'):
@@ -724,6 +1008,7 @@ def create_expense():
     
     db.session.add(expense)
     db.session.commit()
+    invalidate_dashboard_cache(user_id)
     
     return jsonify({
         'message': 'Expense created successfully',
@@ -735,7 +1020,7 @@ def create_expense():
 @jwt_required()
 def delete_expense(expense_id):
     """Delete an expense"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     expense = Expense.query.filter_by(id=expense_id, user_id=user_id).first()
     
     if not expense:
@@ -743,6 +1028,7 @@ def delete_expense(expense_id):
     
     db.session.delete(expense)
     db.session.commit()
+    invalidate_dashboard_cache(user_id)
     
     return jsonify({'message': 'Expense deleted successfully'}), 200
 
@@ -750,18 +1036,29 @@ def delete_expense(expense_id):
 # Subscriptions Routes
 @app.route('/api/subscriptions', methods=['GET'])
 @jwt_required()
+@private_cache()
 def get_subscriptions():
     """Get all subscriptions for user"""
-    user_id = get_jwt_identity()
-    subscriptions = Subscription.query.filter_by(user_id=user_id).all()
-    return jsonify([s.to_dict() for s in subscriptions]), 200
+    user_id = current_user_id()
+    rows = db.session.execute(
+        select(
+            Subscription.id, Subscription.customer_name, Subscription.phone,
+            Subscription.email, Subscription.address, Subscription.product_id,
+            func.coalesce(Product.name, '').label('product_name'),
+            Subscription.quantity, Subscription.frequency, Subscription.supply_days,
+            Subscription.status, Subscription.created_at
+        )
+        .join(Product, Subscription.product_id == Product.id, isouter=True)
+        .where(Subscription.user_id == user_id)
+    ).mappings().all()
+    return jsonify([{**row, 'supply_days': row['supply_days'] or []} for row in rows]), 200
 
 
 @app.route('/api/subscriptions', methods=['POST'])
 @jwt_required()
 def create_subscription():
     """Create a new subscription"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
     data = request.get_json()
     
     if not data or not data.get('customer_name') or not data.get('product_id'):
@@ -776,12 +1073,13 @@ def create_subscription():
         product_id=data['product_id'],
         quantity=data.get('quantity'),
         frequency=data.get('frequency'),
-        supply_days=','.join(data['supply_days']) if data.get('supply_days') else '',
+        supply_days=data.get('supply_days') or [],
         status='Active'
     )
     
     db.session.add(subscription)
     db.session.commit()
+    invalidate_dashboard_cache(user_id)
     
     return jsonify({
         'message': 'Subscription created successfully',
@@ -794,42 +1092,61 @@ def create_subscription():
 @jwt_required()
 def get_dashboard_analytics():
     """Get dashboard metrics"""
-    user_id = get_jwt_identity()
+    user_id = current_user_id()
+    cache_key = dashboard_cache_key(user_id)
+    
+    try:
+        cached = r.get(cache_key)
+        if cached:
+            return Response(cached, mimetype='application/json')
+    except redis.RedisError:
+        pass
     
     # Get current month sales
     today = datetime.utcnow()
     start_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     
-    sales = Sale.query.filter(
+    total_revenue, total_boxes, sales_count = db.session.query(
+        func.coalesce(func.sum(Sale.total), 0),
+        func.coalesce(func.sum(Sale.quantity), 0),
+        func.count(Sale.id)
+    ).filter(
         Sale.user_id == user_id,
         Sale.date >= start_of_month
-    ).all()
+    ).one()
     
-    expenses = Expense.query.filter(
+    total_expenses, expense_count = db.session.query(
+        func.coalesce(func.sum(Expense.amount), 0),
+        func.count(Expense.id)
+    ).filter(
         Expense.user_id == user_id,
         Expense.date >= start_of_month
-    ).all()
+    ).one()
     
-    subscriptions = Subscription.query.filter(
+    active_subscriptions = db.session.query(func.count(Subscription.id)).filter(
         Subscription.user_id == user_id,
         Subscription.status == 'Active'
-    ).all()
+    ).scalar()
     
     # Calculate metrics
-    total_revenue = sum(s.total for s in sales)
-    total_boxes = sum(s.quantity for s in sales if s.quantity)
-    total_expenses = sum(e.amount for e in expenses)
     profit = total_revenue - total_expenses
     
-    return jsonify({
+    payload = {
         'profit': profit,
         'sales_boxes': total_boxes,
-        'active_subscriptions': len(subscriptions),
+        'active_subscriptions': active_subscriptions,
         'monthly_expenses': total_expenses,
         'total_revenue': total_revenue,
-        'sales_count': len(sales),
-        'expense_count': len(expenses)
-    }), 200
+        'sales_count': sales_count,
+        'expense_count': expense_count
+    }
+    
+    try:
+        r.setex(cache_key, DASHBOARD_CACHE_TTL, orjson.dumps(payload))
+    except redis.RedisError:
+        pass
+    
+    return jsonify(payload), 200
 
 
 # Health Check Route
@@ -845,6 +1162,11 @@ def not_found(error):
     return jsonify({'error': 'Resource not found'}), 404
 
 
+@app.errorhandler(429)
+def rate_limited(error):
+    return jsonify({'error': 'Too many requests, please try again later'}), 429
+
+
 @app.errorhandler(500)
 def internal_error(error):
     db.session.rollback()
@@ -852,12 +1174,25 @@ def internal_error(error):
 
 
 # Database initialization
-@app.before_request
-def create_tables():
-    db.create_all()
+def init_db():
+    """Create missing tables"""
+    with app.app_context():
+        db.create_all()
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create missing tables (run once before starting gunicorn)"""
+    init_db()
+    print('Database tables created')
+
+
+# Move startup objects (models, routes, config) out of the GC's young generations
+gc.freeze()
 
 
 if __name__ == '__main__':
+    init_db()
     app.run(
         host=os.getenv('FLASK_HOST', '0.0.0.0'),
         port=int(os.getenv('FLASK_PORT', 5000)),
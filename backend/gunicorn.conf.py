@@ -0,0 +1,21 @@
+# Gunicorn configuration for the Mushroom CRM API
+# gunicorn -c gunicorn.conf.py app:app
+
+# Patch before the app is preloaded so psycopg and redis sockets yield to greenlets
+from gevent import monkey
+monkey.patch_all()
+
+import multiprocessing
+import os
+
+# Each worker has its own SQLAlchemy pool: workers * (size + overflow) connections.
+# The config runs before the app is loaded, so these reach the engine options.
+os.environ.setdefault('DB_POOL_SIZE', '4')
+os.environ.setdefault('DB_MAX_OVERFLOW', '4')
+
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gevent'
+worker_connections = 1000
+preload_app = True
+keepalive = 5
@@ -0,0 +1,18 @@
+# Gunicorn configuration for the /api/auth/* routes
+# gunicorn -c gunicorn_auth.conf.py app:app
+#
+# Password hashing is CPU-bound and would stall a gevent worker's event loop,
+# so auth traffic is served by a separate pool of synchronous workers.
+
+import os
+
+# A sync worker serves one request at a time, so it never needs more than one
+# connection; keep a small pool per worker.
+os.environ.setdefault('DB_POOL_SIZE', '2')
+os.environ.setdefault('DB_MAX_OVERFLOW', '0')
+
+bind = os.getenv('GUNICORN_AUTH_BIND', '127.0.0.1:5001')
+workers = int(os.getenv('GUNICORN_AUTH_WORKERS', 8))
+worker_class = 'sync'
+preload_app = True
+timeout = 30
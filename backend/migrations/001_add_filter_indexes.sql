@@ -0,0 +1,9 @@
+-- Composite indexes for the per-user filters and date ordering used by the API
+-- (chunk0-4 dashboard range scans, chunk0-10 list endpoints).
+
+CREATE INDEX IF NOT EXISTS ix_products_user ON products (user_id);
+CREATE INDEX IF NOT EXISTS ix_warehouses_user ON warehouses (user_id);
+CREATE INDEX IF NOT EXISTS ix_inventory_user_warehouse_product ON inventory (user_id, warehouse_id, product_id);
+CREATE INDEX IF NOT EXISTS ix_sales_user_date ON sales (user_id, date DESC);
+CREATE INDEX IF NOT EXISTS ix_expenses_user_date ON expenses (user_id, date DESC);
+CREATE INDEX IF NOT EXISTS ix_subscriptions_user_status ON subscriptions (user_id, status);
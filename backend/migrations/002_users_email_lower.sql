@@ -0,0 +1,18 @@
+-- Normalize stored emails and replace the plain email index with a
+-- case-insensitive unique one (chunk0-13).
+--
+-- Fails if two accounts differ only by case or surrounding whitespace; find
+-- and resolve those first with:
+--   SELECT lower(trim(email)), array_agg(id) FROM users
+--   GROUP BY lower(trim(email)) HAVING count(*) > 1;
+
+BEGIN;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email_lower ON users (lower(email));
+
+-- Every lookup goes through lower(email), so the old unique index only costs writes
+DROP INDEX IF EXISTS ix_users_email;
+
+UPDATE users SET email = lower(trim(email)) WHERE email <> lower(trim(email));
+
+COMMIT;
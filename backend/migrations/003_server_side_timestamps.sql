@@ -0,0 +1,75 @@
+-- Move created_at/updated_at to timezone-aware columns with database-side
+-- defaults (chunk0-17). Existing naive values were written as UTC.
+--
+-- Without this, rows inserted by the current code on an older database get
+-- created_at = NULL because the app no longer sets it in Python.
+
+BEGIN;
+
+ALTER TABLE users
+    ALTER COLUMN created_at TYPE timestamptz USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now();
+UPDATE users SET created_at = now() WHERE created_at IS NULL;
+ALTER TABLE users ALTER COLUMN created_at SET NOT NULL;
+
+ALTER TABLE users
+    ALTER COLUMN updated_at TYPE timestamptz USING updated_at AT TIME ZONE 'UTC',
+    ALTER COLUMN updated_at SET DEFAULT now();
+UPDATE users SET updated_at = now() WHERE updated_at IS NULL;
+ALTER TABLE users ALTER COLUMN updated_at SET NOT NULL;
+
+ALTER TABLE products
+    ALTER COLUMN created_at TYPE timestamptz USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now();
+UPDATE products SET created_at = now() WHERE created_at IS NULL;
+ALTER TABLE products ALTER COLUMN created_at SET NOT NULL;
+
+ALTER TABLE products
+    ALTER COLUMN updated_at TYPE timestamptz USING updated_at AT TIME ZONE 'UTC',
+    ALTER COLUMN updated_at SET DEFAULT now();
+UPDATE products SET updated_at = now() WHERE updated_at IS NULL;
+ALTER TABLE products ALTER COLUMN updated_at SET NOT NULL;
+
+ALTER TABLE warehouses
+    ALTER COLUMN created_at TYPE timestamptz USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now();
+UPDATE warehouses SET created_at = now() WHERE created_at IS NULL;
+ALTER TABLE warehouses ALTER COLUMN created_at SET NOT NULL;
+
+ALTER TABLE warehouses
+    ALTER COLUMN updated_at TYPE timestamptz USING updated_at AT TIME ZONE 'UTC',
+    ALTER COLUMN updated_at SET DEFAULT now();
+UPDATE warehouses SET updated_at = now() WHERE updated_at IS NULL;
+ALTER TABLE warehouses ALTER COLUMN updated_at SET NOT NULL;
+
+ALTER TABLE inventory
+    ALTER COLUMN created_at TYPE timestamptz USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now();
+UPDATE inventory SET created_at = now() WHERE created_at IS NULL;
+ALTER TABLE inventory ALTER COLUMN created_at SET NOT NULL;
+
+ALTER TABLE sales
+    ALTER COLUMN created_at TYPE timestamptz USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now();
+UPDATE sales SET created_at = now() WHERE created_at IS NULL;
+ALTER TABLE sales ALTER COLUMN created_at SET NOT NULL;
+
+ALTER TABLE expenses
+    ALTER COLUMN created_at TYPE timestamptz USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now();
+UPDATE expenses SET created_at = now() WHERE created_at IS NULL;
+ALTER TABLE expenses ALTER COLUMN created_at SET NOT NULL;
+
+ALTER TABLE subscriptions
+    ALTER COLUMN created_at TYPE timestamptz USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now();
+UPDATE subscriptions SET created_at = now() WHERE created_at IS NULL;
+ALTER TABLE subscriptions ALTER COLUMN created_at SET NOT NULL;
+
+ALTER TABLE wholesale_customers
+    ALTER COLUMN created_at TYPE timestamptz USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now();
+UPDATE wholesale_customers SET created_at = now() WHERE created_at IS NULL;
+ALTER TABLE wholesale_customers ALTER COLUMN created_at SET NOT NULL;
+
+COMMIT;
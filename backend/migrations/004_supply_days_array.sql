@@ -0,0 +1,13 @@
+-- Convert subscriptions.supply_days from a comma-separated string to a text
+-- array with a GIN index (chunk0-19).
+
+BEGIN;
+
+ALTER TABLE subscriptions
+    ALTER COLUMN supply_days TYPE text[]
+        USING COALESCE(string_to_array(NULLIF(supply_days, ''), ','), '{}'),
+    ALTER COLUMN supply_days SET DEFAULT '{}';
+
+CREATE INDEX IF NOT EXISTS ix_subscriptions_supply_days ON subscriptions USING gin (supply_days);
+
+COMMIT;
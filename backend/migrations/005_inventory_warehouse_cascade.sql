@@ -0,0 +1,12 @@
+-- Let Postgres delete a warehouse's inventory rows with the warehouse
+-- (chunk0-20). The constraint name is Postgres's default for the FK that
+-- create_all() generated.
+
+BEGIN;
+
+ALTER TABLE inventory
+    DROP CONSTRAINT IF EXISTS inventory_warehouse_id_fkey,
+    ADD CONSTRAINT inventory_warehouse_id_fkey
+        FOREIGN KEY (warehouse_id) REFERENCES warehouses (id) ON DELETE CASCADE;
+
+COMMIT;
@@ -0,0 +1,36 @@
+-- Add the unique constraint the inventory upsert's ON CONFLICT clause relies on
+-- (chunk0-21). The old SELECT-then-INSERT code could create duplicate
+-- (user_id, warehouse_id, product_id) rows, so merge those first: the oldest
+-- row keeps the summed quantity and the latest date.
+
+BEGIN;
+
+LOCK TABLE inventory IN SHARE ROW EXCLUSIVE MODE;
+
+WITH merged AS (
+    SELECT min(id) AS keep_id,
+           sum(COALESCE(quantity, 0)) AS quantity,
+           max(date) AS date
+    FROM inventory
+    GROUP BY user_id, warehouse_id, product_id
+    HAVING count(*) > 1
+)
+UPDATE inventory i
+SET quantity = m.quantity, date = m.date
+FROM merged m
+WHERE i.id = m.keep_id;
+
+DELETE FROM inventory i
+USING inventory k
+WHERE i.user_id = k.user_id
+  AND i.warehouse_id = k.warehouse_id
+  AND i.product_id = k.product_id
+  AND i.id > k.id;
+
+ALTER TABLE inventory
+    ADD CONSTRAINT uq_inv_uwp UNIQUE (user_id, warehouse_id, product_id);
+
+-- The constraint's index replaces the plain composite index from 001
+DROP INDEX IF EXISTS ix_inventory_user_warehouse_product;
+
+COMMIT;